@@ -1,20 +1,186 @@
 import argparse
 import csv
+import gzip
+import json
+import math
+import os
 import re
+import resource
+import struct
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import chain
 from pathlib import Path
 
 import nibabel as nib
 import numpy as np
 from concurrent.futures import ProcessPoolExecutor
-from scipy.ndimage import binary_erosion, binary_dilation
+from scipy.ndimage import binary_erosion, binary_dilation, find_objects
 from tqdm import tqdm
 
 
 STRUCT = np.ones((3, 3, 3), dtype=bool)
 
 
+class _Profiler:
+    """Per-worker stage timings for --profile; one instance per process, reset per case."""
+
+    def __init__(self) -> None:
+        self.case = ""
+        self.events: list[tuple[str, float, float]] = []
+
+    def begin(self, case: str) -> None:
+        self.case = case
+        self.events = []
+
+    def record(self, name: str, t0: float) -> None:
+        self.events.append((name, t0, time.time() - t0))
+
+
+class _Span:
+    __slots__ = ("prof", "name", "t0")
+
+    def __init__(self, prof: _Profiler, name: str) -> None:
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.t0 = time.time()
+
+    def __exit__(self, *exc) -> None:
+        self.prof.record(self.name, self.t0)
+
+
+class _Prefetcher:
+    """Reads raw file bytes ahead of use on a small thread pool; one instance per worker.
+
+    Files must be requested in the order they were queued; anything skipped (e.g. a
+    prediction whose label is missing) is dropped. At most `depth` reads are outstanding.
+    File sizes are only known once a read completes (no stat on the compute thread), so
+    `budget` caps completed-but-unconsumed buffers; new reads start only while below it.
+    """
+
+    def __init__(self, depth: int, budget: int) -> None:
+        self.depth = depth
+        self.budget = budget
+        self.order: deque[Path] = deque()
+        self.queue: deque[tuple[Path, Future]] = deque()
+        self.pool = ThreadPoolExecutor(max_workers=min(depth, 4))
+
+    def extend(self, paths: list[Path]) -> None:
+        self.order.extend(paths)
+        self._fill()
+
+    def _buffered(self) -> int:
+        return sum(len(fut.result()) for _, fut in self.queue if fut.done() and fut.exception() is None)
+
+    def _fill(self) -> None:
+        while self.order and len(self.queue) < self.depth:
+            if self.queue and self._buffered() >= self.budget:
+                break
+            p = self.order.popleft()
+            self.queue.append((p, self.pool.submit(p.read_bytes)))
+
+    def get(self, p: Path) -> bytes:
+        data = None
+        if any(q == p for q, _ in self.queue):
+            while self.queue:
+                q, fut = self.queue.popleft()
+                if q == p:
+                    data = fut.result()
+                    break
+                fut.cancel()
+        else:
+            if p in self.order:
+                for _, fut in self.queue:
+                    fut.cancel()
+                self.queue.clear()
+                while self.order.popleft() != p:
+                    pass
+            data = p.read_bytes()
+        self._fill()
+        return data
+
+    def reset(self) -> None:
+        # Drop leftovers (skipped files) so their buffers do not count against the next chunk
+        for _, fut in self.queue:
+            fut.cancel()
+        self.queue.clear()
+        self.order.clear()
+
+
+_PROF: _Profiler | None = None
+_NULL_SPAN = nullcontext()
+_PREFETCHER: _Prefetcher | None = None
+
+
+def _init_worker(profile: bool, prefetch: int = 0, prefetch_bytes: int = 0) -> None:
+    global _PROF, _PREFETCHER
+    _PROF = _Profiler() if profile else None
+    _PREFETCHER = _Prefetcher(prefetch, prefetch_bytes) if prefetch > 0 else None
+
+
+def _span(name: str):
+    # Shared no-op context when profiling is off, so the hot path allocates nothing
+    return _NULL_SPAN if _PROF is None else _Span(_PROF, name)
+
+
+def _load_img(p: Path) -> nib.Nifti1Image:
+    with _span("read"):
+        raw = p.read_bytes() if _PREFETCHER is None else _PREFETCHER.get(p)
+    with _span("decode"):
+        if p.name.endswith(".gz"):
+            raw = gzip.decompress(raw)
+        return nib.Nifti1Image.from_bytes(raw)
+
+
 def load_seg_bool(p: Path) -> np.ndarray:
-    return nib.load(str(p)).get_fdata() > 0.5
+    img = _load_img(p)
+    with _span("convert"):
+        return img.get_fdata() > 0.5
+
+
+def load_seg_int(p: Path) -> np.ndarray:
+    img = _load_img(p)
+    with _span("convert"):
+        # Keep the stored integer dtype (typically uint8/int16); scaled or float-stored maps are rounded
+        arr = np.asanyarray(img.dataobj)
+        return arr if arr.dtype.kind in "iu" else np.rint(arr).astype(np.int16)
+
+
+def load_labels(dataset_root: Path) -> dict[str, int]:
+    with (dataset_root / "dataset.json").open("r") as f:
+        labels = json.load(f)["labels"]
+    out: dict[str, int] = {}
+    for name, v in labels.items():
+        if not isinstance(v, int):
+            raise ValueError(f"Region-based label '{name}' is not supported for multi-class evaluation")
+        out[name] = v
+    return out
+
+
+# nnU-Net readers whose arrays (and hence saved probabilities) are the nibabel array with axes reversed
+# (SimpleITK's z, y, x). NibabelIOWithReorient reorients to RAS first, which a plain nibabel read cannot match.
+REVERSED_AXES_READERS = {"SimpleITKIO", "NibabelIO"}
+
+
+def check_reader_writer(dataset_root: Path) -> str:
+    """Reader/writer nnU-Net uses for this dataset; raises if its probability axis order is not supported."""
+    with (dataset_root / "dataset.json").open("r") as f:
+        meta = json.load(f)
+    rw = meta.get("overwrite_image_reader_writer")
+    if rw in (None, "None"):
+        # nnU-Net's automatic choice: SimpleITKIO is the first registered reader for NIfTI
+        if meta.get("file_ending", ".nii.gz") not in (".nii.gz", ".nii"):
+            raise ValueError(f"Soft evaluation supports NIfTI datasets only, got file_ending {meta.get('file_ending')}")
+        rw = "SimpleITKIO"
+    if rw not in REVERSED_AXES_READERS:
+        raise ValueError(f"Soft evaluation does not support overwrite_image_reader_writer={rw!r}; "
+                         f"supported: {sorted(REVERSED_AXES_READERS)}")
+    return rw
 
 
 def dice(a: np.ndarray, b: np.ndarray) -> float:
@@ -44,6 +210,174 @@ def biou(a: np.ndarray, b: np.ndarray) -> float:
     return float(inter / u)
 
 
+def confusion(gt: np.ndarray, pred: np.ndarray, num_classes: int) -> np.ndarray:
+    """Full class confusion counts (rows: gt, cols: pred) from a single bincount."""
+    if gt.shape != pred.shape:
+        raise ValueError(f"Shape mismatch: {gt.shape} vs {pred.shape}")
+    lo = min(int(gt.min()), int(pred.min())) if gt.size else 0
+    hi = max(int(gt.max()), int(pred.max())) if gt.size else 0
+    if lo < 0 or hi >= num_classes:
+        raise ValueError(f"Label values must be in [0, {num_classes - 1}], got [{lo}, {hi}]")
+    idx = num_classes * gt.ravel().astype(np.int64) + pred.ravel().astype(np.int64)
+    return np.bincount(idx, minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+
+
+def class_dice(cm: np.ndarray) -> np.ndarray:
+    """Per-class Dice from confusion counts; NaN where a class is absent in both gt and pred."""
+    tp = np.diag(cm).astype(float)
+    den = cm.sum(axis=1) + cm.sum(axis=0)
+    out = np.full(cm.shape[0], np.nan)
+    np.divide(2.0 * tp, den, out=out, where=den > 0)
+    return out
+
+
+def fg_dice(cm: np.ndarray) -> float:
+    # Same value as dice(gt > 0, pred > 0), read off the confusion counts
+    inter = cm[1:, 1:].sum()
+    den = cm[1:, :].sum() + cm[:, 1:].sum()
+    if den == 0:
+        return 1.0
+    return float(2.0 * inter / den)
+
+
+def _union_slices(a: tuple | None, b: tuple | None) -> tuple | None:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return tuple(slice(min(x.start, y.start), max(x.stop, y.stop)) for x, y in zip(a, b))
+
+
+def class_biou(gt: np.ndarray, pred: np.ndarray, num_classes: int) -> np.ndarray:
+    """Per-class Boundary IoU, each computed on the class's bounding box only.
+
+    Boxes come from one find_objects pass per volume and are padded by one voxel so
+    erosion/dilation see the same neighbourhood as on the full volume.
+    NaN where a class is absent in both gt and pred.
+    """
+    out = np.full(num_classes, np.nan)
+    boxes_g = find_objects(gt, max_label=num_classes - 1)
+    boxes_p = find_objects(pred, max_label=num_classes - 1)
+    for c in range(1, num_classes):
+        box = _union_slices(boxes_g[c - 1], boxes_p[c - 1])
+        if box is None:
+            continue
+        box = tuple(slice(max(0, s.start - 1), min(n, s.stop + 1)) for s, n in zip(box, gt.shape))
+        out[c] = biou(gt[box] == c, pred[box] == c)
+    return out
+
+
+class NpzProbabilities:
+    """Slab-wise reader for the (C, z, y, x) array in nnU-Net --save_probabilities .npz files.
+
+    An uncompressed (stored) member is memory-mapped in place; a deflated one (nnU-Net's
+    default savez_compressed) is decompressed sequentially, so only one slab is held at a time.
+    """
+
+    def __init__(self, path: Path, key: str = "probabilities") -> None:
+        self.path = path
+        self.zf = zipfile.ZipFile(path)
+        self.info = self.zf.getinfo(f"{key}.npy")
+        with self.zf.open(self.info) as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                self.shape, self.fortran, self.dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                self.shape, self.fortran, self.dtype = np.lib.format.read_array_header_2_0(f)
+            self.header_len = f.tell()
+        self.mm: np.ndarray | None = None
+        if self.info.compress_type == zipfile.ZIP_STORED and not self.fortran:
+            with path.open("rb") as f:
+                f.seek(self.info.header_offset)
+                local = f.read(30)
+            name_len, extra_len = struct.unpack("<HH", local[26:30])
+            offset = self.info.header_offset + 30 + name_len + extra_len + self.header_len
+            self.mm = np.memmap(path, dtype=self.dtype, mode="r", offset=offset, shape=self.shape)
+
+    def iter_slabs(self, slab: int, channels: set[int]):
+        """Yield (channel, z0, array of shape (<=slab, y, x)) for the requested channels, in file order."""
+        n_ch, nz = self.shape[0], self.shape[1]
+        if self.mm is not None:
+            for c in sorted(channels):
+                for z0 in range(0, nz, slab):
+                    yield c, z0, self.mm[c, z0:z0 + slab]
+            return
+        if self.fortran:
+            # Channels are not contiguous on disk; fall back to a full read
+            with self.zf.open(self.info) as f:
+                arr = np.lib.format.read_array(f)
+            for c in sorted(channels):
+                for z0 in range(0, nz, slab):
+                    yield c, z0, arr[c, z0:z0 + slab]
+            return
+        plane = int(np.prod(self.shape[2:]))
+        with self.zf.open(self.info) as f:
+            f.read(self.header_len)
+            for c in range(n_ch):
+                for z0 in range(0, nz, slab):
+                    k = min(slab, nz - z0)
+                    buf = f.read(k * plane * self.dtype.itemsize)
+                    if c in channels:
+                        yield c, z0, np.frombuffer(buf, dtype=self.dtype).reshape((k,) + tuple(self.shape[2:]))
+
+    def close(self) -> None:
+        self.mm = None
+        self.zf.close()
+
+
+class SoftAccumulator:
+    """Running sums and probability histograms for one class; metrics need no per-threshold passes."""
+
+    def __init__(self, bins: int) -> None:
+        self.bins = bins
+        self.n = 0
+        self.sum_p = 0.0
+        self.sum_p2 = 0.0
+        self.sum_pg = 0.0
+        self.sum_g = 0
+        self.hist_n = np.zeros(bins, dtype=np.int64)
+        self.hist_pos = np.zeros(bins, dtype=np.int64)
+        self.hist_p = np.zeros(bins, dtype=float)
+
+    def update(self, p: np.ndarray, g: np.ndarray) -> None:
+        p = np.clip(p.ravel().astype(np.float64), 0.0, 1.0)
+        g = g.ravel()
+        idx = np.minimum((p * self.bins).astype(np.int64), self.bins - 1)
+        self.n += p.size
+        self.sum_p += float(p.sum())
+        self.sum_p2 += float(np.dot(p, p))
+        self.sum_pg += float(p[g].sum())
+        self.sum_g += int(g.sum())
+        self.hist_n += np.bincount(idx, minlength=self.bins)
+        self.hist_pos += np.bincount(idx[g], minlength=self.bins)
+        self.hist_p += np.bincount(idx, weights=p, minlength=self.bins)
+
+    def soft_dice(self) -> float:
+        den = self.sum_p + self.sum_g
+        return 1.0 if den == 0 else float(2.0 * self.sum_pg / den)
+
+    def brier(self) -> float:
+        if self.n == 0:
+            return 0.0
+        return float((self.sum_p2 - 2.0 * self.sum_pg + self.sum_g) / self.n)
+
+    def ece(self) -> float:
+        if self.n == 0:
+            return 0.0
+        nz = self.hist_n > 0
+        gap = np.abs(self.hist_p[nz] - self.hist_pos[nz]) / self.hist_n[nz]
+        return float((self.hist_n[nz] / self.n * gap).sum())
+
+    def dice_curve(self) -> np.ndarray:
+        """Hard Dice at thresholds k/bins, k = 1..bins-1 (voxels with p >= threshold are foreground)."""
+        tp = np.cumsum(self.hist_pos[::-1])[::-1][1:]
+        pred = np.cumsum(self.hist_n[::-1])[::-1][1:]
+        den = pred + self.sum_g
+        out = np.ones(self.bins - 1)
+        np.divide(2.0 * tp, den, out=out, where=den > 0)
+        return out
+
+
 def lesion_type(name: str) -> str:
     m = re.search(r"_type-([^_]+)", name)
     return m.group(1) if m else "unknown"
@@ -68,10 +402,15 @@ def stats(vals: list[float]) -> tuple[float, float, int]:
     return float(arr.mean()), float(arr.std(ddof=0)), int(arr.size)
 
 
+def nanstats(vals: list[float]) -> tuple[float, float, int]:
+    return stats([v for v in vals if not math.isnan(v)])
+
+
 def write_rows(rows: list[dict], out_csv: Path) -> None:
     cols = [
-        "scope","lesion_type","n_cases","dsc_mean","dsc_std","biou_mean","biou_std",
+        "scope","lesion_type","label","n_cases","dsc_mean","dsc_std","biou_mean","biou_std",
         "n_triplets","agree_dsc_mean","agree_dsc_std","agree_biou_mean","agree_biou_std",
+        "soft_dsc_mean","soft_dsc_std","brier_mean","brier_std","ece_mean","ece_std",
     ]
     out_csv.parent.mkdir(parents=True, exist_ok=True)
     with out_csv.open("w", newline="") as f:
@@ -85,30 +424,221 @@ def _eval_one(pred_path: Path, label_path: Path) -> tuple[str, float, float] | N
         return None
     p = load_seg_bool(pred_path)
     g = load_seg_bool(label_path)
-    return lesion_type(pred_path.name), dice(g, p), biou(g, p)
+    with _span("dice"):
+        d = dice(g, p)
+    with _span("morphology"):
+        b = biou(g, p)
+    return lesion_type(pred_path.name), d, b
+
+
+def _eval_one_multiclass(pred_path: Path, label_path: Path, num_classes: int
+                         ) -> tuple[str, float, float, np.ndarray, np.ndarray] | None:
+    if not label_path.exists():
+        return None
+    p = load_seg_int(pred_path)
+    g = load_seg_int(label_path)
+    with _span("confusion"):
+        cm = confusion(g, p, num_classes)
+    with _span("morphology"):
+        b = biou(g > 0, p > 0)
+        cb = class_biou(g, p, num_classes)
+    return lesion_type(pred_path.name), fg_dice(cm), b, class_dice(cm), cb
+
+
+def _soft_one(npz_path: Path, label_path: Path, num_classes: int, bins: int, slab: int
+              ) -> tuple[str, np.ndarray, np.ndarray, np.ndarray, np.ndarray] | None:
+    if not label_path.exists():
+        return None
+    # Probabilities are in SimpleITK axis order (z, y, x), the reverse of nibabel's; see check_reader_writer
+    g = load_seg_int(label_path).T
+    probs = NpzProbabilities(npz_path)
+    try:
+        if tuple(probs.shape[1:]) != g.shape or probs.shape[0] != num_classes:
+            raise ValueError(f"{npz_path.name}: probabilities {probs.shape} do not match label {g.shape} "
+                             f"with {num_classes} classes")
+        accs = {c: SoftAccumulator(bins) for c in range(1, num_classes)}
+        with _span("soft"):
+            for c, z0, p in probs.iter_slabs(slab, set(accs)):
+                accs[c].update(p, g[z0:z0 + p.shape[0]] == c)
+    finally:
+        probs.close()
+    sd = np.full(num_classes, np.nan); br = np.full(num_classes, np.nan); ece = np.full(num_classes, np.nan)
+    curve = np.full((num_classes, bins - 1), np.nan)
+    for c, acc in accs.items():
+        sd[c], br[c], ece[c], curve[c] = acc.soft_dice(), acc.brier(), acc.ece(), acc.dice_curve()
+    return lesion_type(npz_path.name), sd, br, ece, curve
 
 
 def _triad_one(key_name: str, normal_p: Path, aug1_p: Path, aug2_p: Path) -> tuple[str, float, float]:
     pn = load_seg_bool(normal_p)
     p1 = load_seg_bool(aug1_p)
     p2 = load_seg_bool(aug2_p)
-    d = (dice(pn, p1) + dice(pn, p2) + dice(p1, p2)) / 3.0
-    b = (biou(pn, p1) + biou(pn, p2) + biou(p1, p2)) / 3.0
+    with _span("dice"):
+        d = (dice(pn, p1) + dice(pn, p2) + dice(p1, p2)) / 3.0
+    with _span("morphology"):
+        b = (biou(pn, p1) + biou(pn, p2) + biou(p1, p2)) / 3.0
     return lesion_type(key_name), float(d), float(b)
 
 
+def _run_case(fn, args: tuple, case: str):
+    if _PROF is None:
+        return fn(*args)
+    _PROF.begin(case)
+    t0 = time.time()
+    res = fn(*args)
+    _PROF.record("case", t0)
+    rec = {"pid": os.getpid(), "case": case, "events": _PROF.events, "t_end": time.time(),
+           "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    return res, rec
+
+
 def _eval_one_tuple(args: tuple[Path, Path]) -> tuple[str, float, float] | None:
-    return _eval_one(*args)
+    return _run_case(_eval_one, args, args[0].name)
+
+
+def _eval_one_multiclass_tuple(args: tuple[Path, Path, int]
+                               ) -> tuple[str, float, float, np.ndarray, np.ndarray] | None:
+    return _run_case(_eval_one_multiclass, args, args[0].name)
+
+
+def _soft_one_tuple(args: tuple[Path, Path, int, int, int]
+                    ) -> tuple[str, np.ndarray, np.ndarray, np.ndarray, np.ndarray] | None:
+    return _run_case(_soft_one, args, args[0].name)
 
 
 def _triad_one_tuple(args: tuple[str, Path, Path, Path]) -> tuple[str, float, float]:
-    return _triad_one(*args)
+    return _run_case(_triad_one, args, args[0])
+
+
+def _run_chunk(args: tuple) -> list:
+    # Run consecutive jobs in one worker task so their files can be read ahead
+    fn, jobs = args
+    if _PREFETCHER is not None:
+        # Only NIfTI files are read ahead; .npz probabilities are streamed slab by slab instead
+        _PREFETCHER.extend([a for job in jobs for a in job if isinstance(a, Path) and a.name.endswith(".nii.gz")])
+    try:
+        results = [fn(job) for job in jobs]
+        if _PROF is not None:
+            # Results leave the worker together; measure result_wait from the chunk's end, not each case's
+            t_end = time.time()
+            for _, rec in results:
+                rec["t_end"] = t_end
+        return results
+    finally:
+        if _PREFETCHER is not None:
+            _PREFETCHER.reset()
+
+
+class Trace:
+    """Collects worker stage records and writes a Chrome-trace/Perfetto JSON plus a summary."""
+
+    def __init__(self) -> None:
+        self.t0 = time.time()
+        self.events: list[dict] = []
+        self.cases: list[tuple[str, str, float, dict[str, float]]] = []
+        self.peak_rss_kb: dict[int, int] = {}
+
+    def _us(self, t: float) -> float:
+        return (t - self.t0) * 1e6
+
+    def unwrap(self, results, phase: str):
+        for res, rec in results:
+            self.add(rec, phase, time.time())
+            yield res
+
+    def add(self, rec: dict, phase: str, t_recv: float) -> None:
+        pid = rec["pid"]
+        per_stage: dict[str, float] = {}
+        for name, ts, dur in rec["events"]:
+            if name != "case":
+                per_stage[name] = per_stage.get(name, 0.0) + dur
+            self.events.append({"name": name, "cat": phase, "ph": "X", "pid": pid, "tid": pid,
+                                "ts": self._us(ts), "dur": dur * 1e6, "args": {"case": rec["case"]}})
+        # Time from worker finishing to the parent consuming the result (pickling, pipe, in-order wait)
+        self.events.append({"name": "result_wait", "cat": phase, "ph": "X", "pid": os.getpid(),
+                            "tid": os.getpid(), "ts": self._us(rec["t_end"]),
+                            "dur": max(0.0, t_recv - rec["t_end"]) * 1e6, "args": {"case": rec["case"]}})
+        self.events.append({"name": "peak_rss_mb", "ph": "C", "pid": pid, "ts": self._us(rec["t_end"]),
+                            "args": {"rss": rec["rss_kb"] / 1024.0}})
+        per_stage["result_wait"] = max(0.0, t_recv - rec["t_end"])
+        total = sum(dur for name, _, dur in rec["events"] if name == "case")
+        self.cases.append((phase, rec["case"], total, per_stage))
+        self.peak_rss_kb[pid] = max(self.peak_rss_kb.get(pid, 0), rec["rss_kb"])
+
+    def write(self, out_json: Path, top: int = 20) -> None:
+        meta = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": f"worker {pid}"}}
+                for pid in self.peak_rss_kb]
+        meta.append({"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": "main"}})
+        out_json.parent.mkdir(parents=True, exist_ok=True)
+        with out_json.open("w") as f:
+            json.dump({"traceEvents": meta + self.events, "displayTimeUnit": "ms"}, f)
+
+        lines = [f"Trace: {out_json}", "", f"{'stage':<14}{'n':>7}{'total_s':>11}{'mean_s':>10}{'max_s':>10}"]
+        by_stage: dict[str, list[float]] = {}
+        for _, _, _, per_stage in self.cases:
+            for name, dur in per_stage.items():
+                by_stage.setdefault(name, []).append(dur)
+        for name in sorted(by_stage, key=lambda k: -sum(by_stage[k])):
+            v = by_stage[name]
+            lines.append(f"{name:<14}{len(v):>7}{sum(v):>11.2f}{sum(v) / len(v):>10.3f}{max(v):>10.3f}")
+        lines += ["", f"Slowest {min(top, len(self.cases))} cases:",
+                  f"{'phase':<12}{'total_s':>9}  {'slowest stage':<22}case"]
+        for phase, case, total, per_stage in sorted(self.cases, key=lambda c: -c[2])[:top]:
+            worst = max(per_stage, key=per_stage.get) if per_stage else ""
+            lines.append(f"{phase:<12}{total:>9.3f}  {worst + f' ({per_stage.get(worst, 0.0):.3f}s)':<22}{case}")
+        lines += ["", "Peak RSS per worker:"]
+        for pid in sorted(self.peak_rss_kb):
+            lines.append(f"  worker {pid}: {self.peak_rss_kb[pid] / 1024.0:.1f} MB")
+        text = "\n".join(lines) + "\n"
+        out_json.with_name(out_json.stem + "_summary.txt").write_text(text)
+        print(text)
+
+
+def _pool(workers: int, trace: Trace | None, prefetch: int = 0, prefetch_mb: int = 0) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(trace is not None, prefetch, prefetch_mb * 1024 * 1024))
+
+
+def _pool_map(ex: ProcessPoolExecutor, fn, jobs: list, trace: Trace | None, phase: str, chunk: int = 0):
+    if chunk > 0:
+        chunks = [(fn, jobs[i:i + chunk]) for i in range(0, len(jobs), chunk)]
+        it = chain.from_iterable(ex.map(_run_chunk, chunks))
+    else:
+        it = ex.map(fn, jobs)
+    return it if trace is None else trace.unwrap(it, phase)
+
+
+def _chunk_size(n_jobs: int, workers: int, prefetch: int) -> int:
+    # Read-ahead only sees files within a chunk; ~4 chunks per worker keeps the load balanced
+    return max(1, -(-n_jobs // (workers * 4))) if prefetch > 0 else 0
+
+
+def write_curve(curve_rows: list[dict], out_csv: Path) -> None:
+    cols = ["lesion_type","label","threshold","n_cases","dsc_mean","dsc_std"]
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    with out_csv.open("w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=cols); w.writeheader()
+        for r in curve_rows:
+            w.writerow(r)
 
 
-def evaluate(dataset_root: Path, preds_dir: Path, out_csv: Path, workers: int = 1) -> None:
+def evaluate(dataset_root: Path, preds_dir: Path, out_csv: Path, workers: int = 1,
+             multiclass: bool = False, profile: Path | None = None,
+             prefetch: int = 0, prefetch_mb: int = 512,
+             soft: bool = False, bins: int = 100, slab: int = 16) -> None:
+    trace = Trace() if profile is not None else None
     labels_dir = dataset_root / "labelsTr"
     pred_files = sorted(preds_dir.glob("*.nii.gz"))
     eval_rec: list[tuple[str, float, float]] = []
+    class_rec: list[tuple[str, np.ndarray, np.ndarray]] = []
+    class_names: dict[int, str] = {}
+    num_classes = 0
+    if soft:
+        check_reader_writer(dataset_root)
+    if multiclass or soft:
+        labels = load_labels(dataset_root)
+        class_names = {v: k for k, v in labels.items() if v > 0}
+        num_classes = max(labels.values()) + 1
     groups: dict[str, dict[str, Path]] = {}
 
     # Build jobs and role groups without I/O first
@@ -120,10 +650,21 @@ def evaluate(dataset_root: Path, preds_dir: Path, out_csv: Path, workers: int =
         groups.setdefault(k, {})[r] = pf
 
     # Evaluate per-file metrics in parallel
-    if eval_jobs:
-        with ProcessPoolExecutor(max_workers=workers) as ex:
-            for res in tqdm(ex.map(_eval_one_tuple, eval_jobs),
-                            total=len(eval_jobs), desc="Evaluating predictions", unit="file"):
+    if eval_jobs and multiclass:
+        mc_jobs = [(pf, lf, num_classes) for pf, lf in eval_jobs]
+        with _pool(workers, trace, prefetch, prefetch_mb) as ex:
+            it = _pool_map(ex, _eval_one_multiclass_tuple, mc_jobs, trace, "evaluation",
+                           _chunk_size(len(mc_jobs), workers, prefetch))
+            for mc_res in tqdm(it, total=len(mc_jobs), desc="Evaluating predictions", unit="file"):
+                if mc_res is not None:
+                    t, d, b, cd, cb = mc_res
+                    eval_rec.append((t, d, b))
+                    class_rec.append((t, cd, cb))
+    elif eval_jobs:
+        with _pool(workers, trace, prefetch, prefetch_mb) as ex:
+            it = _pool_map(ex, _eval_one_tuple, eval_jobs, trace, "evaluation",
+                           _chunk_size(len(eval_jobs), workers, prefetch))
+            for res in tqdm(it, total=len(eval_jobs), desc="Evaluating predictions", unit="file"):
                 if res is not None:
                     eval_rec.append(res)
 
@@ -142,6 +683,46 @@ def evaluate(dataset_root: Path, preds_dir: Path, out_csv: Path, workers: int =
             rows.append({"scope":"evaluation","lesion_type":t,"n_cases":n,
                         "dsc_mean":md,"dsc_std":sd,"biou_mean":mb,"biou_std":sb})
 
+    if class_rec:
+        types = ["ALL"] + sorted({t for t, _, _ in class_rec})
+        for t in types:
+            sel = [(cd, cb) for tt, cd, cb in class_rec if t == "ALL" or tt == t]
+            for c in sorted(class_names):
+                md, sd, n = nanstats([cd[c] for cd, _ in sel])
+                mb, sb, _ = nanstats([cb[c] for _, cb in sel])
+                rows.append({"scope":"class","lesion_type":t,"label":class_names[c],"n_cases":n,
+                             "dsc_mean":md,"dsc_std":sd,"biou_mean":mb,"biou_std":sb})
+
+    curve_rows: list[dict] = []
+    soft_jobs = [(nf, labels_dir / (nf.name[:-len(".npz")] + ".nii.gz"), num_classes, bins, slab)
+                 for nf in sorted(preds_dir.glob("*.npz"))] if soft else []
+    soft_rec: list[tuple[str, np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = []
+    if soft_jobs:
+        with _pool(workers, trace, prefetch, prefetch_mb) as ex:
+            it = _pool_map(ex, _soft_one_tuple, soft_jobs, trace, "soft",
+                           _chunk_size(len(soft_jobs), workers, prefetch))
+            for s_res in tqdm(it, total=len(soft_jobs), desc="Evaluating probabilities", unit="file"):
+                if s_res is not None:
+                    soft_rec.append(s_res)
+
+    if soft_rec:
+        thresholds = np.arange(1, bins) / bins
+        types = ["ALL"] + sorted({r[0] for r in soft_rec})
+        for t in types:
+            sel = [r for r in soft_rec if t == "ALL" or r[0] == t]
+            for c in sorted(class_names):
+                md, sd, n = nanstats([r[1][c] for r in sel])
+                mbr, sbr, _ = nanstats([r[2][c] for r in sel])
+                me, se, _ = nanstats([r[3][c] for r in sel])
+                rows.append({"scope":"soft","lesion_type":t,"label":class_names[c],"n_cases":n,
+                             "soft_dsc_mean":md,"soft_dsc_std":sd,"brier_mean":mbr,"brier_std":sbr,
+                             "ece_mean":me,"ece_std":se})
+                curves = np.stack([r[4][c] for r in sel])
+                for k, thr in enumerate(thresholds):
+                    md, sd, n = nanstats(curves[:, k].tolist())
+                    curve_rows.append({"lesion_type":t,"label":class_names[c],"threshold":float(thr),
+                                       "n_cases":n,"dsc_mean":md,"dsc_std":sd})
+
     triad: list[tuple[str, float, float]] = []
     triad_jobs: list[tuple[str, Path, Path, Path]] = []
     for k, rs in groups.items():
@@ -149,9 +730,10 @@ def evaluate(dataset_root: Path, preds_dir: Path, out_csv: Path, workers: int =
             triad_jobs.append((k, rs["normal"], rs["aug1"], rs["aug2"]))
 
     if triad_jobs:
-        with ProcessPoolExecutor(max_workers=workers) as ex:
-            for t_res in tqdm(ex.map(_triad_one_tuple, triad_jobs),
-                               total=len(triad_jobs), desc="Computing agreement", unit="triplet"):
+        with _pool(workers, trace, prefetch, prefetch_mb) as ex:
+            it = _pool_map(ex, _triad_one_tuple, triad_jobs, trace, "agreement",
+                           _chunk_size(len(triad_jobs), workers, prefetch))
+            for t_res in tqdm(it, total=len(triad_jobs), desc="Computing agreement", unit="triplet"):
                 triad.append(t_res)
 
     if triad:
@@ -171,6 +753,10 @@ def evaluate(dataset_root: Path, preds_dir: Path, out_csv: Path, workers: int =
                         "agree_biou_mean":mb,"agree_biou_std":sb})
 
     write_rows(rows, out_csv)
+    if curve_rows:
+        write_curve(curve_rows, out_csv.with_name(out_csv.stem + "_dice_curve.csv"))
+    if trace is not None:
+        trace.write(profile)
 
 
 def main() -> None:
@@ -179,8 +765,24 @@ def main() -> None:
     p.add_argument("--preds", type=Path, default=Path("/data/bodyct/experiments/nielsrocholl/ULS+/nnUNet_raw/Dataset401_Longitudinal_CT_Test_128/preds"))
     p.add_argument("--out", type=Path, default=Path("/data/bodyct/experiments/nielsrocholl/ULS+/nnUNet_raw/Dataset401_Longitudinal_CT_Test_128/uls_metrics.csv"))
     p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--multiclass", action="store_true",
+                   help="Also score every label in dataset.json from integer label maps (scope 'class' rows)")
+    p.add_argument("--profile", type=Path, default=None,
+                   help="Write per-stage worker timings as Chrome-trace JSON here (plus *_summary.txt)")
+    p.add_argument("--prefetch", type=int, default=0,
+                   help="Files each worker reads ahead on background threads (0 disables read-ahead)")
+    p.add_argument("--prefetch-mb", type=int, default=512,
+                   help="Per-worker byte budget for read-ahead buffers, in MB")
+    p.add_argument("--soft", action="store_true",
+                   help="Also score *.npz probabilities (soft Dice, Brier, ECE, Dice-vs-threshold curve)")
+    p.add_argument("--bins", type=int, default=100,
+                   help="Probability histogram bins for --soft; thresholds are k/bins")
+    p.add_argument("--slab", type=int, default=16,
+                   help="z-planes of one probability channel held in memory at a time for --soft")
     args = p.parse_args()
-    evaluate(args.dataset_root, args.preds, args.out, workers=args.workers)
+    evaluate(args.dataset_root, args.preds, args.out, workers=args.workers, multiclass=args.multiclass,
+             profile=args.profile, prefetch=args.prefetch, prefetch_mb=args.prefetch_mb,
+             soft=args.soft, bins=args.bins, slab=args.slab)
 
 
 if __name__ == "__main__":
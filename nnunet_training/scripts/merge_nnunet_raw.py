@@ -1,10 +1,12 @@
 import argparse
+import hashlib
 import json
 import os
 import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 
 def read_json(path: Path) -> Dict:
@@ -101,11 +103,59 @@ def safe_link_or_copy(src: Path, dst: Path, mode: str) -> None:
             dst.unlink()
         os.symlink(src, dst)
     elif mode == "copy":
+        # dst may be a dedup hardlink shared with other cases; never write through it
+        if dst.exists() or dst.is_symlink():
+            dst.unlink()
         shutil.copy2(src, dst)
     else:
         raise ValueError("mode must be 'link' or 'copy'")
 
 
+def hardlink_or_copy(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists() or dst.is_symlink():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        # e.g. filesystem without hardlink support
+        shutil.copy2(src, dst)
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_files(paths: List[Path], cache_path: Optional[Path], workers: int) -> Dict[Path, str]:
+    """Content hashes for paths, reusing cache entries whose size and mtime are unchanged."""
+    cache: Dict[str, Dict] = {}
+    if cache_path is not None and cache_path.exists():
+        cache = read_json(cache_path)
+    hashes: Dict[Path, str] = {}
+    todo: List[Tuple[Path, int, int]] = []
+    for p in paths:
+        st = p.stat()
+        entry = cache.get(str(p))
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            hashes[p] = entry["sha256"]
+        else:
+            todo.append((p, st.st_size, st.st_mtime_ns))
+
+    print(f"Hashing {len(todo)} image files ({len(paths) - len(todo)} cached)...", flush=True)
+    # hashlib releases the GIL on large buffers, so threads overlap I/O and hashing
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        for (p, size, mtime_ns), digest in zip(todo, ex.map(lambda t: file_sha256(t[0]), todo)):
+            hashes[p] = digest
+            cache[str(p)] = {"size": size, "mtime_ns": mtime_ns, "sha256": digest}
+    if cache_path is not None and todo:
+        write_json(cache_path, cache)
+    return hashes
+
+
 def compute_total_ops(raw_root: Path, dataset_ids: List[int]) -> Tuple[int, Dict]:
     ref_meta = None
     total = 0
@@ -146,6 +196,9 @@ def merge_datasets(
     force: bool,
     always_prefix: bool,
     manifest_path: Path,
+    dedup: bool = False,
+    hash_cache: Optional[Path] = None,
+    hash_workers: int = 8,
 ) -> None:
     dest_dir = raw_root / f"Dataset{dest_id:03d}_{dest_name}"
     images_out = dest_dir / "imagesTr"
@@ -170,6 +223,18 @@ def merge_datasets(
     existing_case_ids: set = set()
     update_interval = max(1, total_ops // 100)
 
+    # content hashes of all image channels, across and within datasets
+    hashes: Dict[Path, str] = {}
+    first_dst: Dict[str, Path] = {}
+    dup_groups: Dict[str, List[Dict[str, str]]] = {}
+    if dedup:
+        all_imgs: List[Path] = []
+        for ds_id in dataset_ids:
+            ds_dir = find_dataset_dir(raw_root, ds_id)
+            for _, img_paths, _ in collect_cases(ds_dir, meta_summary["file_ending"]):
+                all_imgs.extend(img_paths)
+        hashes = hash_files(all_imgs, hash_cache, hash_workers)
+
     for ds_id in dataset_ids:
         ds_dir = find_dataset_dir(raw_root, ds_id)
         meta = read_json(ds_dir / "dataset.json")
@@ -196,7 +261,19 @@ def merge_datasets(
                 base = strip_file_ending(img.name, file_ending)
                 chan = base.split("_")[-1]
                 dst = images_out / f"{new_case_id}_{chan}{file_ending}"
-                safe_link_or_copy(img, dst, mode)
+                digest = hashes.get(img)
+                if digest is not None and digest in first_dst:
+                    dup_groups[digest].append({"merged": dst.name, "origin": str(img)})
+                    # store each unique payload once: hardlink to the first copy
+                    if mode == "copy":
+                        hardlink_or_copy(first_dst[digest], dst)
+                    else:
+                        safe_link_or_copy(img, dst, mode)
+                else:
+                    safe_link_or_copy(img, dst, mode)
+                    if digest is not None:
+                        first_dst[digest] = dst
+                        dup_groups[digest] = [{"merged": dst.name, "origin": str(img)}]
                 done_ops += 1
                 if done_ops % update_interval == 0 or done_ops == total_ops:
                     render_progress(done_ops, total_ops)
@@ -230,6 +307,12 @@ def merge_datasets(
         out_meta["overwrite_image_reader_writer"] = ref_meta["overwrite_image_reader_writer"]
     write_json(dest_dir / "dataset.json", out_meta)
 
+    if dedup:
+        groups = [{"sha256": h, "files": files} for h, files in dup_groups.items() if len(files) > 1]
+        merged_manifest["duplicates"] = groups
+        n_dup = sum(len(g["files"]) - 1 for g in groups)
+        print(f"Dedup: {n_dup} duplicate image files in {len(groups)} groups.")
+
     # manifest for traceability
     write_json(manifest_path, merged_manifest)
 
@@ -283,6 +366,23 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Path to write a manifest JSON mapping merged cases to their origins. Defaults to DEST/dataset_merged_manifest.json",
     )
+    p.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Hash image files and record identical ones in the manifest; in copy mode, hardlink duplicates to one copy.",
+    )
+    p.add_argument(
+        "--hash-cache",
+        type=Path,
+        default=None,
+        help="JSON cache of image hashes keyed by path, reused while size/mtime match. Defaults to DEST/image_hash_cache.json",
+    )
+    p.add_argument(
+        "--hash-workers",
+        type=int,
+        default=8,
+        help="Threads used to hash image files when --dedup is set.",
+    )
     args = p.parse_args()
     if args.raw_root is None:
         raise RuntimeError("--raw-root is required if env nnUNet_raw is not set")
@@ -303,6 +403,9 @@ def main() -> None:
         force=args.force,
         always_prefix=args.always_prefix,
         manifest_path=manifest_path,
+        dedup=args.dedup,
+        hash_cache=args.hash_cache or (dest_dir / "image_hash_cache.json"),
+        hash_workers=args.hash_workers,
     )
 
 
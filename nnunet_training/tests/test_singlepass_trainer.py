@@ -0,0 +1,127 @@
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("nnunetv2")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "trainers"))
+
+from nnUNetTrainerSinglePass import nnUNetDataLoaderSinglePass, nnUNetTrainerSinglePass  # noqa: E402
+from nnunetv2.utilities.label_handling.label_handling import LabelManager  # noqa: E402
+
+
+PATCH = (8, 10, 12)
+
+
+class TinyDataset:
+    """In-memory stand-in for nnU-Net datasets: identifiers + load_case()."""
+
+    def __init__(self, shapes):
+        self.identifiers = [f"case{i}" for i in range(len(shapes))]
+        self.cases = {}
+        rng = np.random.default_rng(0)
+        for key, shape in zip(self.identifiers, shapes):
+            data = rng.random((1, *shape), dtype=np.float32)
+            seg = (data > 0.5).astype(np.int16)
+            self.cases[key] = (data, seg)
+        self.loads = 0
+
+    def load_case(self, key):
+        self.loads += 1
+        data, seg = self.cases[key]
+        return data, seg, None, {}
+
+
+def make_loader(dataset, cache_dir=None, transforms=None):
+    label_manager = LabelManager({"background": 0, "lesion": 1}, regions_class_order=None)
+    return nnUNetDataLoaderSinglePass(dataset, 2, PATCH, label_manager, transforms=transforms, cache_dir=cache_dir)
+
+
+def test_batch_is_padded_to_patch_size():
+    dataset = TinyDataset([(6, 10, 9), (8, 7, 12)])
+    batch = make_loader(dataset).generate_train_batch()
+    assert tuple(batch["data"].shape) == (2, 1, *PATCH)
+    assert tuple(batch["target"].shape) == (2, 1, *PATCH)
+    assert "seg" not in batch
+
+
+def test_seg_padding_is_minus_one():
+    dataset = TinyDataset([(6, 10, 9)])
+    data, seg = make_loader(dataset).load_padded("case0")
+    assert data.shape == (1, *PATCH) and seg.shape == (1, *PATCH)
+    # z: 6 -> 8 pads one plane on each side; x: 9 -> 12 pads 1 before, 2 after
+    assert (seg[:, 0] == -1).all() and (seg[:, -1] == -1).all()
+    assert (seg[..., :1] == -1).all() and (seg[..., -2:] == -1).all()
+    assert (data[:, 0] == 0).all()
+    inner = seg[:, 1:7, :, 1:10]
+    np.testing.assert_array_equal(inner, dataset.cases["case0"][1])
+
+
+def test_cache_is_reused_through_mmap(tmp_path):
+    dataset = TinyDataset([(6, 10, 9)])
+    loader = make_loader(dataset, cache_dir=tmp_path / "cache")
+    first_data, first_seg = loader.load_padded("case0")
+    assert dataset.loads == 1
+    assert (tmp_path / "cache" / "case0_data.npy").exists()
+
+    data, seg = loader.load_padded("case0")
+    assert dataset.loads == 1
+    assert isinstance(data, np.memmap) and isinstance(seg, np.memmap)
+    np.testing.assert_array_equal(data, first_data)
+    np.testing.assert_array_equal(seg, first_seg)
+
+
+def test_without_cache_dir_cases_are_padded_in_memory(tmp_path):
+    dataset = TinyDataset([(6, 10, 9)])
+    loader = make_loader(dataset)
+    loader.load_padded("case0")
+    data, _ = loader.load_padded("case0")
+    assert dataset.loads == 2
+    assert not isinstance(data, np.memmap)
+
+
+def test_cache_dir_only_when_env_is_set(tmp_path, monkeypatch):
+    trainer = SimpleNamespace(
+        configuration_manager=SimpleNamespace(configuration={"patch_size": list(PATCH)}),
+        plans_manager=SimpleNamespace(dataset_name="Dataset090_X", plans_name="nnUNetResEncUNetLPlans"),
+        configuration_name="3d_fullres_singlepass",
+    )
+    monkeypatch.delenv("nnUNet_singlepass_cache", raising=False)
+    assert nnUNetTrainerSinglePass._padded_cache_dir(trainer) is None
+    monkeypatch.setenv("nnUNet_singlepass_cache", str(tmp_path))
+    cache_dir = nnUNetTrainerSinglePass._padded_cache_dir(trainer)
+    assert cache_dir.parent == tmp_path
+    assert cache_dir.name.startswith("Dataset090_X__nnUNetResEncUNetLPlans__3d_fullres_singlepass__")
+
+
+def test_case_larger_than_patch_raises():
+    dataset = TinyDataset([(9, 10, 12)])
+    with pytest.raises(ValueError, match="does not fit patch_size"):
+        make_loader(dataset).load_padded("case0")
+
+
+def test_check_fits_lists_all_oversized_cases():
+    dataset = TinyDataset([(9, 10, 12), (6, 10, 9), (8, 11, 13)])
+    loader = make_loader(dataset)
+    with pytest.raises(ValueError) as exc:
+        loader.check_fits()
+    msg = str(exc.value)
+    assert "2 case(s)" in msg
+    assert "case0: (9, 10, 12)" in msg and "case2: (8, 11, 13)" in msg and "case1" not in msg
+    assert "at least (9, 11, 13)" in msg
+    make_loader(TinyDataset([(6, 10, 9)])).check_fits()
+
+
+def test_validation_transforms_with_deep_supervision():
+    from nnunetv2.training.nnUNetTrainer.nnUNetTrainer import nnUNetTrainer
+
+    transforms = nnUNetTrainer.get_validation_transforms(
+        [[1, 1, 1], [0.5, 0.5, 0.5]], is_cascaded=False, foreground_labels=[1], regions=None, ignore_label=None
+    )
+    batch = make_loader(TinyDataset([(6, 10, 9), (8, 7, 12)]), transforms=transforms).generate_train_batch()
+    assert tuple(batch["data"].shape) == (2, 1, *PATCH)
+    assert [tuple(t.shape) for t in batch["target"]] == [(2, 1, 8, 10, 12), (2, 1, 4, 5, 6)]
+    # padding (-1) is mapped to background by the stock transforms
+    assert batch["target"][0].min() >= 0
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+import torch
+from batchgenerators.dataloading.nondet_multi_threaded_augmenter import NonDetMultiThreadedAugmenter
+from batchgenerators.dataloading.single_threaded_augmenter import SingleThreadedAugmenter
+from threadpoolctl import threadpool_limits
+
+from nnunetv2.training.dataloading.data_loader import nnUNetDataLoader
+from nnunetv2.training.dataloading.nnunet_dataset import infer_dataset_class
+from nnunetv2.training.nnUNetTrainer.nnUNetTrainer import nnUNetTrainer
+from nnunetv2.utilities.default_n_proc_DA import get_allowed_n_proc_DA
+
+
+def center_pad(arr: np.ndarray, shape: Tuple[int, ...], value: float) -> np.ndarray:
+    """Pad (with `value`) the trailing spatial axes of a channel-first array to `shape`, centered."""
+    spatial = arr.shape[1:]
+    if tuple(spatial) == tuple(shape):
+        return arr
+    if any(n > p for n, p in zip(spatial, shape)):
+        # Cropping could drop foreground; the single-pass patch must cover every case
+        raise ValueError(
+            f"Case of preprocessed shape {tuple(spatial)} does not fit patch_size {tuple(shape)}; "
+            "increase patch_size of the configuration in the plans"
+        )
+    pad = [(0, 0)] + [((p - n) // 2, p - n - (p - n) // 2) for n, p in zip(spatial, shape)]
+    return np.pad(arr, pad, mode="constant", constant_values=value)
+
+
+class nnUNetDataLoaderSinglePass(nnUNetDataLoader):
+    """Whole-case loader for single-pass configurations (patch_size covers every case).
+
+    Each case is padded once to the fixed patch shape and, if `cache_dir` is given, written
+    there as .npy and memory-mapped on later epochs. No crop location is sampled and no
+    foreground oversampling is done. A case larger than the patch raises ValueError; call
+    `check_fits()` up front to find all of them at once. Works with
+    any dataset exposing `identifiers` and `load_case()`, so it runs on CPU with a tiny
+    in-memory dataset. Cascades are not supported.
+    """
+
+    def __init__(
+        self,
+        data,
+        batch_size: int,
+        patch_size: Union[List[int], Tuple[int, ...]],
+        label_manager,
+        transforms=None,
+        cache_dir: Optional[Path] = None,
+    ):
+        super().__init__(
+            data,
+            batch_size,
+            patch_size,
+            patch_size,
+            label_manager,
+            oversample_foreground_percent=0.0,
+            transforms=transforms,
+        )
+        self.cache_dir = cache_dir
+        if cache_dir is not None:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def check_fits(self) -> None:
+        """Raise ValueError listing every case whose preprocessed shape exceeds patch_size."""
+        oversized = []
+        for key in self._data.identifiers:
+            # load_case is lazy for blosc2/memory-mapped data, so only the shape is read here
+            shape = tuple(int(n) for n in self._data.load_case(key)[0].shape[1:])
+            if any(n > p for n, p in zip(shape, self.patch_size)):
+                oversized.append((key, shape))
+        if oversized:
+            needed = tuple(max([p] + [shape[d] for _, shape in oversized]) for d, p in enumerate(self.patch_size))
+            listing = "\n".join(f"  {key}: {shape}" for key, shape in oversized)
+            raise ValueError(
+                f"{len(oversized)} case(s) do not fit patch_size {tuple(self.patch_size)} (preprocessed shapes):\n"
+                f"{listing}\nSet patch_size of the configuration in the plans to at least {needed} "
+                "(rounded up to the network's pooling divisibility)."
+            )
+
+    def _save_atomic(self, path: Path, arr: np.ndarray) -> None:
+        # Augmentation workers may pad the same case concurrently; last rename wins, readers never see partial files
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as f:
+            np.save(f, arr)
+        tmp.replace(path)
+
+    def load_padded(self, key: str) -> Tuple[np.ndarray, np.ndarray]:
+        if self.cache_dir is not None:
+            data_p = self.cache_dir / f"{key}_data.npy"
+            seg_p = self.cache_dir / f"{key}_seg.npy"
+            if data_p.exists() and seg_p.exists():
+                return np.load(data_p, mmap_mode="r"), np.load(seg_p, mmap_mode="r")
+        data, seg, seg_prev, _ = self._data.load_case(key)
+        if seg_prev is not None:
+            raise NotImplementedError("nnUNetDataLoaderSinglePass does not support cascaded training")
+        data = center_pad(np.asarray(data, dtype=np.float32), self.patch_size, 0)
+        # -1 marks padding outside the image, as in the stock crop_and_pad_nd path
+        seg = center_pad(np.asarray(seg, dtype=np.int16), self.patch_size, -1)
+        if self.cache_dir is not None:
+            self._save_atomic(data_p, data)
+            self._save_atomic(seg_p, seg)
+        return data, seg
+
+    def generate_train_batch(self):
+        selected_keys = self.get_indices()
+        # allocated from the first sample: transforms (deep supervision) decide the output shapes
+        data_all = None
+        seg_all = None
+
+        with torch.no_grad():
+            with threadpool_limits(limits=1, user_api=None):
+                for j, key in enumerate(selected_keys):
+                    data, seg = self.load_padded(key)
+                    data_t = torch.from_numpy(np.array(data, dtype=np.float32))
+                    seg_t = torch.from_numpy(np.array(seg, dtype=np.int16))
+                    if self.transforms is not None:
+                        tmp = self.transforms(**{"image": data_t, "segmentation": seg_t})
+                        data_t = tmp["image"]
+                        seg_t = tmp["segmentation"]
+
+                    if data_all is None:
+                        data_all = torch.empty((self.batch_size, *data_t.shape), dtype=torch.float32)
+                    data_all[j] = data_t
+                    if isinstance(seg_t, list):
+                        if seg_all is None:
+                            seg_all = [torch.empty((self.batch_size, *s.shape), dtype=s.dtype) for s in seg_t]
+                        for s_idx, s in enumerate(seg_t):
+                            seg_all[s_idx][j] = s
+                    else:
+                        if seg_all is None:
+                            seg_all = torch.empty((self.batch_size, *seg_t.shape), dtype=seg_t.dtype)
+                        seg_all[j] = seg_t
+        return {"data": data_all, "target": seg_all, "keys": selected_keys}
+
+
+class nnUNetTrainerSinglePass(nnUNetTrainer):
+    """nnUNetTrainer for `3d_fullres_singlepass`: feeds whole padded cases instead of sampled crops.
+
+    Every train/val case is checked against patch_size before the augmenters start. Padded
+    cases are cached on disk only if `$nnUNet_singlepass_cache` is set (use fresh per-job
+    scratch: entries are not revalidated against the preprocessed data); otherwise cases are
+    padded in memory on every load. The number of augmentation processes follows nnU-Net's
+    `nnUNet_n_proc_DA`.
+    """
+
+    def _padded_cache_dir(self) -> Optional[Path]:
+        root = os.environ.get("nnUNet_singlepass_cache")
+        if not root:
+            return None
+        config = json.dumps(self.configuration_manager.configuration, sort_keys=True, default=str)
+        digest = hashlib.sha1(config.encode()).hexdigest()[:12]
+        return Path(root) / (
+            f"{self.plans_manager.dataset_name}__{self.plans_manager.plans_name}__{self.configuration_name}__{digest}"
+        )
+
+    def get_dataloaders(self):
+        if self.dataset_class is None:
+            self.dataset_class = infer_dataset_class(self.preprocessed_dataset_folder)
+
+        patch_size = self.configuration_manager.patch_size
+        deep_supervision_scales = self._get_deep_supervision_scales()
+        # initial_patch_size is only needed for random crops, which single-pass skips
+        rotation_for_DA, do_dummy_2d_data_aug, _, mirror_axes = (
+            self.configure_rotation_dummyDA_mirroring_and_inital_patch_size()
+        )
+        regions = self.label_manager.foreground_regions if self.label_manager.has_regions else None
+        tr_transforms = self.get_training_transforms(
+            patch_size,
+            rotation_for_DA,
+            deep_supervision_scales,
+            mirror_axes,
+            do_dummy_2d_data_aug,
+            use_mask_for_norm=self.configuration_manager.use_mask_for_norm,
+            is_cascaded=self.is_cascaded,
+            foreground_labels=self.label_manager.foreground_labels,
+            regions=regions,
+            ignore_label=self.label_manager.ignore_label,
+        )
+        val_transforms = self.get_validation_transforms(
+            deep_supervision_scales,
+            is_cascaded=self.is_cascaded,
+            foreground_labels=self.label_manager.foreground_labels,
+            regions=regions,
+            ignore_label=self.label_manager.ignore_label,
+        )
+
+        dataset_tr, dataset_val = self.get_tr_and_val_datasets()
+        cache_dir = self._padded_cache_dir()
+        dl_tr = nnUNetDataLoaderSinglePass(
+            dataset_tr, self.batch_size, patch_size, self.label_manager, transforms=tr_transforms, cache_dir=cache_dir
+        )
+        dl_val = nnUNetDataLoaderSinglePass(
+            dataset_val, self.batch_size, patch_size, self.label_manager, transforms=val_transforms, cache_dir=cache_dir
+        )
+        # fail now rather than when an augmenter worker first samples an oversized case
+        dl_tr.check_fits()
+        dl_val.check_fits()
+
+        allowed_num_processes = get_allowed_n_proc_DA()
+        if allowed_num_processes == 0:
+            mt_gen_train = SingleThreadedAugmenter(dl_tr, None)
+            mt_gen_val = SingleThreadedAugmenter(dl_val, None)
+        else:
+            pin_memory = self.device.type == "cuda"
+            mt_gen_train = NonDetMultiThreadedAugmenter(
+                data_loader=dl_tr,
+                transform=None,
+                num_processes=allowed_num_processes,
+                num_cached=max(6, allowed_num_processes // 2),
+                seeds=None,
+                pin_memory=pin_memory,
+                wait_time=0.002,
+            )
+            mt_gen_val = NonDetMultiThreadedAugmenter(
+                data_loader=dl_val,
+                transform=None,
+                num_processes=max(1, allowed_num_processes // 2),
+                num_cached=max(3, allowed_num_processes // 4),
+                seeds=None,
+                pin_memory=pin_memory,
+                wait_time=0.002,
+            )
+        # warm up the generators, as the stock trainer does
+        _ = next(mt_gen_train)
+        _ = next(mt_gen_val)
+        return mt_gen_train, mt_gen_val